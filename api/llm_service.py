@@ -2,29 +2,170 @@
 Shared LLM Service
 Provides a unified interface for calling LLM APIs (Gemini, Claude, etc.)
 """
+import asyncio
 import os
 import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+import httpx
 from dotenv import load_dotenv
 from google import genai
 
+from api.rate_limiter import RateLimiter
+
 logger = logging.getLogger(__name__)
 
 # Load .env into os.environ so GEMINI_API_KEY can come from file or from the process environment
 load_dotenv()
 
 
-def _get_gemini_api_key() -> str:
-    """Read GEMINI_API_KEY from the environment (os.environ); .env is loaded above into os.environ."""
+# Long-lived keep-alive connection pools so bursts of calls reuse TLS connections
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=60)
+
+
+def _http_options() -> genai.types.HttpOptions:
+    """
+    HTTP options for one Gemini client, applying the keep-alive limits to both transports
+    
+    The async side is given an explicit httpx transport: with aiohttp installed the
+    SDK would otherwise send async calls through aiohttp and ignore httpx limits.
+    Each client needs its own transport, since closing a client closes its transport.
+    """
+    return genai.types.HttpOptions(
+        client_args={"limits": _HTTP_LIMITS},
+        async_client_args={"transport": httpx.AsyncHTTPTransport(limits=_HTTP_LIMITS)},
+    )
+
+
+def _get_gemini_api_keys() -> List[str]:
+    """
+    Read Gemini API keys from the environment (os.environ); .env is loaded above into os.environ.
+    
+    GEMINI_KEY_1..GEMINI_KEY_N (keys from separate projects, each with its own quota)
+    take precedence; GEMINI_API_KEY is used when none are set.
+    """
+    keys = []
+    n = 1
+    while os.environ.get(f"GEMINI_KEY_{n}", "").strip():
+        keys.append(os.environ[f"GEMINI_KEY_{n}"].strip())
+        n += 1
+    if keys:
+        return keys
     key = os.environ.get("GEMINI_API_KEY")
     if not key or not key.strip():
         raise ValueError("GEMINI_API_KEY not found in environment variables")
-    return key.strip()
+    return [key.strip()]
+
+
+class _PooledClient:
+    """A Gemini client plus the sliding-window usage of its project quota"""
+    
+    def __init__(self, index: int, api_key: str):
+        self.index = index
+        self.client = genai.Client(api_key=api_key, http_options=_http_options())
+        self.minute_window: Deque[Tuple[float, int]] = deque()  # (timestamp, tokens)
+        self.day_window: Deque[float] = deque()
+        self.minute_tokens = 0
+        self.cooldown_until = 0.0
+    
+    def expire(self, now: float) -> None:
+        while self.minute_window and now - self.minute_window[0][0] >= 60:
+            _, tokens = self.minute_window.popleft()
+            self.minute_tokens -= tokens
+        while self.day_window and now - self.day_window[0] >= 86400:
+            self.day_window.popleft()
+
+
+class GeminiKeyPool:
+    """Routes each call to the API key with the most remaining RPM/TPM/RPD headroom"""
+    
+    def __init__(self, api_keys: List[str], rpm: int, tpm: int, rpd: int):
+        self._clients = [_PooledClient(i, key) for i, key in enumerate(api_keys)]
+        self.rpm = rpm
+        self.tpm = tpm
+        self.rpd = rpd
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._clients)
+    
+    def _has_headroom(self, pooled: _PooledClient, now: float, tokens: int) -> bool:
+        return (
+            pooled.cooldown_until <= now
+            and len(pooled.minute_window) < self.rpm
+            and pooled.minute_tokens + tokens <= self.tpm
+            and len(pooled.day_window) < self.rpd
+        )
+    
+    def acquire(self, estimated_tokens: int) -> _PooledClient:
+        """
+        Pick the least-used client with headroom and record the call against its quota
+        
+        Falls back to the least-used client not in cooldown (then any client) when every
+        key is saturated; the shared rate limiter keeps that case rare.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for pooled in self._clients:
+                pooled.expire(now)
+            candidates = [c for c in self._clients if self._has_headroom(c, now, estimated_tokens)]
+            if not candidates:
+                candidates = [c for c in self._clients if c.cooldown_until <= now] or self._clients
+            pooled = min(candidates, key=lambda c: len(c.minute_window))
+            pooled.minute_window.append((now, estimated_tokens))
+            pooled.minute_tokens += estimated_tokens
+            pooled.day_window.append(now)
+        return pooled
+    
+    def mark_throttled(self, pooled: _PooledClient, cooldown: float = 60.0) -> None:
+        """Take a client out of rotation after the provider rejected it with a 429"""
+        with self._lock:
+            pooled.cooldown_until = time.monotonic() + cooldown
+        logger.warning("Gemini key #%d throttled, cooling down for %.0fs", pooled.index + 1, cooldown)
+    
+    def has_available(self) -> bool:
+        """Whether any client is currently out of cooldown"""
+        now = time.monotonic()
+        return any(c.cooldown_until <= now for c in self._clients)
+    
+    async def aclose(self) -> None:
+        """Close every client's connection pools"""
+        for pooled in self._clients:
+            await pooled.client.aio.aclose()
+            pooled.client.close()
 
 
-# Initialize Gemini client
-_gemini_client = genai.Client(api_key=_get_gemini_api_key())
 _GEMINI_MODEL = "gemini-2.5-flash"
 
+# Per-key (per-project) limits, defaulting to the Gemini free tier; override per deployment plan
+_GEMINI_RPM = int(os.environ.get("GEMINI_RPM", "10"))
+_GEMINI_TPM = int(os.environ.get("GEMINI_TPM", "250000"))
+_GEMINI_RPD = int(os.environ.get("GEMINI_RPD", "250"))
+
+# Initialize one Gemini client per configured API key
+_key_pool = GeminiKeyPool(_get_gemini_api_keys(), rpm=_GEMINI_RPM, tpm=_GEMINI_TPM, rpd=_GEMINI_RPD)
+
+# Overall client-side limits scale with the number of keys in the pool
+_rate_limiter = RateLimiter(
+    rpm=_GEMINI_RPM * len(_key_pool),
+    tpm=_GEMINI_TPM * len(_key_pool),
+    max_concurrency=int(os.environ.get("GEMINI_CONCURRENCY", "4")),
+)
+
+# Retry policy for throttled (429) and unavailable (503) responses
+_RETRY_MAX_ATTEMPTS = 3
+_RETRY_BASE_BACKOFF_MS = 1000
+# Longest Retry-After honored; beyond it the request fails rather than holding the caller
+_RETRY_MAX_DELAY_S = 30.0
+
+
+async def close_llm_clients() -> None:
+    """Drain the Gemini connection pools; call once on application shutdown."""
+    await _key_pool.aclose()
+
 
 def call_llm(prompt: str) -> str:
     """
@@ -45,31 +186,193 @@ def call_llm(prompt: str) -> str:
     Raises:
         ValueError: If API call fails (quota, model not found, etc.)
     """
-    try:
-        response = _gemini_client.models.generate_content(
-            model=_GEMINI_MODEL,
-            contents=prompt,
+    estimated_tokens = _estimate_tokens(prompt)
+    for attempt in range(_RETRY_MAX_ATTEMPTS):
+        pooled = _key_pool.acquire(estimated_tokens)
+        try:
+            response = pooled.client.models.generate_content(
+                model=_GEMINI_MODEL,
+                contents=prompt,
+            )
+            break
+        except Exception as e:
+            if attempt + 1 < _RETRY_MAX_ATTEMPTS and _is_retryable(e):
+                time.sleep(_handle_retryable_error(e, pooled, attempt))
+                continue
+            _raise_api_error(e)
+    return _extract_text(response)
+
+
+async def call_llm_async(prompt: str) -> str:
+    """
+    Async variant of call_llm using the Gemini client's native async surface.
+    
+    Awaiting this does not block the event loop, so concurrent requests
+    overlap their LLM round trips on a single worker. Calls are gated by the
+    module rate limiter and throttled responses are retried with backoff.
+    
+    Args:
+        prompt: The prompt to send to the LLM
+        
+    Returns:
+        Raw text response from the LLM
+        
+    Raises:
+        ValueError: If API call fails (quota, model not found, etc.)
+    """
+    estimated_tokens = _estimate_tokens(prompt)
+    for attempt in range(_RETRY_MAX_ATTEMPTS):
+        try:
+            async with _rate_limiter.acquire(estimated_tokens):
+                pooled = _key_pool.acquire(estimated_tokens)
+                response = await pooled.client.aio.models.generate_content(
+                    model=_GEMINI_MODEL,
+                    contents=prompt,
+                )
+            break
+        except Exception as e:
+            if attempt + 1 < _RETRY_MAX_ATTEMPTS and _is_retryable(e):
+                delay = _handle_retryable_error(e, pooled, attempt)
+                logger.warning(
+                    "Gemini request throttled (attempt %d/%d), retrying in %.1fs",
+                    attempt + 1, _RETRY_MAX_ATTEMPTS, delay
+                )
+                await asyncio.sleep(delay)
+                continue
+            _raise_api_error(e)
+    return _extract_text(response)
+
+
+async def call_llm_stream(prompt: str) -> AsyncIterator[str]:
+    """
+    Stream the LLM response as text chunks while it is being generated.
+    
+    Uses the same rate limiting and key routing as call_llm_async. The
+    concurrency slot is held only until the first chunk arrives, so slow
+    readers cannot starve other LLM calls. Throttled requests are retried
+    only before the first chunk has been yielded.
+    
+    Args:
+        prompt: The prompt to send to the LLM
+        
+    Yields:
+        Raw text chunks of the LLM response
+        
+    Raises:
+        ValueError: If API call fails or the response contains no text
+    """
+    estimated_tokens = _estimate_tokens(prompt)
+    for attempt in range(_RETRY_MAX_ATTEMPTS):
+        received = False
+        try:
+            async with _rate_limiter.acquire(estimated_tokens):
+                pooled = _key_pool.acquire(estimated_tokens)
+                stream = await pooled.client.aio.models.generate_content_stream(
+                    model=_GEMINI_MODEL,
+                    contents=prompt,
+                )
+                chunks = stream.__aiter__()
+                first = await _next_text(chunks)
+            if first is not None:
+                received = True
+                yield first
+                async for chunk in chunks:
+                    text = getattr(chunk, "text", None)
+                    if text:
+                        yield text
+            break
+        except Exception as e:
+            if not received and attempt + 1 < _RETRY_MAX_ATTEMPTS and _is_retryable(e):
+                delay = _handle_retryable_error(e, pooled, attempt)
+                logger.warning(
+                    "Gemini stream throttled (attempt %d/%d), retrying in %.1fs",
+                    attempt + 1, _RETRY_MAX_ATTEMPTS, delay
+                )
+                await asyncio.sleep(delay)
+                continue
+            _raise_api_error(e)
+    if not received:
+        raise ValueError(
+            "Gemini returned no text (response may have been blocked or empty). "
+            "Try a different prompt or check safety settings."
         )
-    except Exception as e:
-        err_msg = str(e)
-        if "429" in err_msg or "RESOURCE_EXHAUSTED" in err_msg or "quota" in err_msg.lower():
-            raise ValueError("Gemini API quota exceeded. Please try again later or check your plan.") from e
-        if "404" in err_msg or "NOT_FOUND" in err_msg:
-            raise ValueError("Gemini model not available. Please check model name.") from e
-        raise ValueError(f"Gemini API error: {err_msg}") from e
 
+
+async def _next_text(chunks: AsyncIterator) -> Optional[str]:
+    """The next non-empty chunk text from a response stream, or None once it is exhausted."""
+    async for chunk in chunks:
+        text = getattr(chunk, "text", None)
+        if text:
+            return text
+    return None
+
+
+def _estimate_tokens(prompt: str) -> int:
+    """Rough token count for rate limiting (~4 characters per token)."""
+    return len(prompt) // 4
+
+
+def _is_retryable(e: Exception) -> bool:
+    """Whether an API error is transient throttling/unavailability worth retrying."""
+    err_msg = str(e)
+    return any(marker in err_msg for marker in ("429", "RESOURCE_EXHAUSTED", "503", "UNAVAILABLE"))
+
+
+def _handle_retryable_error(e: Exception, pooled: _PooledClient, attempt: int) -> float:
+    """
+    Cool down a throttled key and return the delay before the next attempt.
+    
+    Retries immediately when another key is still available, otherwise backs off.
+    """
+    err_msg = str(e)
+    if "429" in err_msg or "RESOURCE_EXHAUSTED" in err_msg:
+        _key_pool.mark_throttled(pooled)
+        if _key_pool.has_available():
+            return 0.0
+    return _retry_delay(e, attempt)
+
+
+def _retry_delay(e: Exception, attempt: int) -> float:
+    """
+    Seconds to wait before the next attempt: Retry-After if given, else jittered exponential backoff.
+    
+    A Retry-After longer than _RETRY_MAX_DELAY_S (e.g. a daily quota reset)
+    is not waited out; the error is raised immediately instead.
+    """
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if headers:
+        try:
+            retry_after = max(float(headers.get("retry-after")), 0.0)
+        except (TypeError, ValueError):
+            retry_after = None
+        if retry_after is not None:
+            if retry_after > _RETRY_MAX_DELAY_S:
+                _raise_api_error(e)
+            return retry_after
+    return _RETRY_BASE_BACKOFF_MS / 1000 * (2 ** attempt) * random.uniform(0.75, 1.25)
+
+
+def _raise_api_error(e: Exception) -> None:
+    """Translate a Gemini SDK exception into a ValueError with a user-facing message."""
+    err_msg = str(e)
+    if "429" in err_msg or "RESOURCE_EXHAUSTED" in err_msg or "quota" in err_msg.lower():
+        raise ValueError("Gemini API quota exceeded. Please try again later or check your plan.") from e
+    if "404" in err_msg or "NOT_FOUND" in err_msg:
+        raise ValueError("Gemini model not available. Please check model name.") from e
+    raise ValueError(f"Gemini API error: {err_msg}") from e
+
+
+def _extract_text(response) -> str:
+    """Pull the text out of a Gemini response, falling back to candidate parts."""
     text = getattr(response, "text", None)
-    if text is None and getattr(response, "candidates", None):
-        parts = []
+    if text is None:
+        # Only walk the candidate parts when the SDK could not assemble .text
         try:
-            c0 = response.candidates[0]
-            if getattr(c0, "content", None) and getattr(c0.content, "parts", None):
-                for part in c0.content.parts:
-                    if getattr(part, "text", None):
-                        parts.append(part.text)
+            text = "".join(
+                part.text for part in response.candidates[0].content.parts if getattr(part, "text", None)
+            ).strip() or None
         except (IndexError, AttributeError, TypeError):
-            pass
-        text = "".join(parts).strip() if parts else None
+            text = None
     if not text:
         raise ValueError(
             "Gemini returned no text (response may have been blocked or empty). "
@@ -2,27 +2,40 @@
 FastAPI Server for Localization API
 Provides HTTP endpoints for AI-powered translation
 """
+import hashlib
 import logging
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
-from dotenv import load_dotenv
-import os
+from typing import AsyncIterator, Optional
+import orjson
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
+# Environment variables (.env) are loaded by api.llm_service, the only module that reads them
 from api.translation_service import TranslationService
-from api.llm_service import call_llm
+from api.llm_service import call_llm_async, close_llm_clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the translation service once per worker at startup and release its connections on shutdown"""
+    app.state.translation_service = TranslationService()
+    yield
+    await app.state.translation_service.aclose()
+    # Close pooled Gemini connections so in-flight keep-alives drain cleanly
+    await close_llm_clients()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AI-Powered Localization API",
     description="Context-aware translation API leveraging translation memory and LLM",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware to allow frontend access
@@ -32,10 +45,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser UIs read the ETag so they can send If-None-Match on repeat requests
+    expose_headers=["ETag"],
 )
 
-# Initialize translation service
-translation_service = TranslationService()
+
+def get_translation_service(request: Request) -> TranslationService:
+    """Dependency returning the worker's translation service created in lifespan"""
+    return request.app.state.translation_service
 
 
 # Request/Response Models
@@ -60,7 +77,8 @@ class TranslationResponse(BaseModel):
     translation: str
     confidence_score: int  # Percentage (0-100), where 100 is perfect confidence
     explanation: str
-    processing_time: str
+    processing_time: str  # Deprecated: formatted copy of processing_time_ms, e.g. "2.30s"
+    processing_time_ms: int
     cost_savings: str
     context_used: dict
 
@@ -74,6 +92,21 @@ class StatsResponse(BaseModel):
     translation_memory_stats: dict
 
 
+class LanguagesResponse(BaseModel):
+    supported_languages: list
+    count: int
+
+
+class ContentTypesResponse(BaseModel):
+    content_types: list
+    count: int
+
+
+class CacheInvalidateResponse(BaseModel):
+    status: str
+    cleared_entries: int
+
+
 class EvaluateRequest(BaseModel):
     prompt: str
     
@@ -89,6 +122,30 @@ class EvaluateResponse(BaseModel):
     response: str
 
 
+_TRANSLATE_CACHE_CONTROL = "private, max-age=86400"
+
+
+def _request_etag(request: BaseModel, generation: int) -> str:
+    """
+    Strong ETag identifying a request body, so byte-identical requests can be answered with 304
+    
+    The translation service's cache generation is mixed in, so ETags issued
+    before a /cache/invalidate no longer match afterwards.
+    """
+    body = request.model_dump_json(exclude_none=True).encode("utf-8")
+    digest = hashlib.blake2b(body, digest_size=16, salt=generation.to_bytes(8, "little"))
+    return '"%s"' % digest.hexdigest()
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value covers the given ETag"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    # "*" is not honored: it would answer 304 for text this server never translated
+    return etag in candidates or f"W/{etag}" in candidates
+
+
 # API Endpoints
 @app.get("/", response_model=HealthResponse)
 async def root():
@@ -100,23 +157,29 @@ async def root():
 
 
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
-    """Detailed health check"""
+async def health_check(translation_service: TranslationService = Depends(get_translation_service)):
+    """Detailed health check, confirming this worker's translation memory was loaded at startup"""
+    stats = translation_service.translation_memory.get_stats()
     return {
         "status": "healthy",
-        "message": "All systems operational"
+        "message": f"All systems operational ({stats['total_translations']} translations in memory)"
     }
 
 
 @app.get("/stats", response_model=StatsResponse)
-async def get_stats():
+async def get_stats(translation_service: TranslationService = Depends(get_translation_service)):
     """Get translation memory statistics"""
     stats = translation_service.translation_memory.get_stats()
     return {"translation_memory_stats": stats}
 
 
 @app.post("/translate", response_model=TranslationResponse)
-async def translate(request: TranslationRequest):
+async def translate(
+    request: TranslationRequest,
+    http_request: Request,
+    response: Response,
+    translation_service: TranslationService = Depends(get_translation_service)
+):
     """
     Translate text with context awareness.
     
@@ -129,14 +192,23 @@ async def translate(request: TranslationRequest):
     
     Returns translation with confidence score (0-100 percentage), explanation, and performance metrics.
     The "translation" field contains pure translated text with no markdown or extra formatting.
+    
+    The response carries an ETag derived from the request body; repeating the request
+    with a matching If-None-Match header returns 304 Not Modified without translating.
     """
+    etag = _request_etag(request, translation_service.generation)
+    if _etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": _TRANSLATE_CACHE_CONTROL})
+    
     try:
-        result = translation_service.translate(
+        result = await translation_service.translate_async(
             source_text=request.source_text,
             target_language=request.target_language,
             content_type=request.content_type,
             product_category=request.product_category
         )
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = _TRANSLATE_CACHE_CONTROL
         return result
     except ValueError as e:
         logger.warning("Translation validation/API error: %s", e)
@@ -146,6 +218,53 @@ async def translate(request: TranslationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/translate/stream")
+async def translate_stream(
+    request: TranslationRequest,
+    translation_service: TranslationService = Depends(get_translation_service)
+):
+    """
+    Translate text and stream the result as Server-Sent Events.
+    
+    Takes the same body as /translate. Emits `delta` events with pieces of the
+    translated text as soon as the LLM produces them, then one `result` event
+    with the full /translate response. Failures are reported as an `error` event.
+    """
+    async def event_stream() -> AsyncIterator[bytes]:
+        try:
+            async for event in translation_service.translate_stream(
+                source_text=request.source_text,
+                target_language=request.target_language,
+                content_type=request.content_type,
+                product_category=request.product_category
+            ):
+                yield b"event: %s\ndata: %s\n\n" % (event["event"].encode(), orjson.dumps(event["data"]))
+        except ValueError as e:
+            logger.warning("Streaming translation validation/API error: %s", e)
+            yield b"event: error\ndata: %s\n\n" % orjson.dumps({"status_code": 502, "detail": str(e)})
+        except Exception as e:
+            logger.exception("Streaming translation failed")
+            yield b"event: error\ndata: %s\n\n" % orjson.dumps({"status_code": 500, "detail": str(e)})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/cache/invalidate", response_model=CacheInvalidateResponse)
+async def invalidate_cache(translation_service: TranslationService = Depends(get_translation_service)):
+    """
+    Reload the translation memory and clear cached context and translation responses.
+    
+    Call this after adding or editing translation memory entries so new
+    requests pick up the updated context instead of cached results.
+    
+    Only the worker handling this request reloads its memory and clears its
+    in-process caches (a Redis response cache is cleared for all workers).
+    With several workers, restart them to pick up the change everywhere.
+    """
+    cleared = await translation_service.invalidate_caches()
+    return {"status": "ok", "cleared_entries": cleared}
+
+
 @app.post("/evaluate", response_model=EvaluateResponse)
 async def evaluate(request: EvaluateRequest):
     """
@@ -167,7 +286,7 @@ async def evaluate(request: EvaluateRequest):
     Returns raw text response from the LLM.
     """
     try:
-        response_text = call_llm(request.prompt)
+        response_text = await call_llm_async(request.prompt)
         return {"response": response_text}
     except ValueError as e:
         logger.warning("LLM evaluation error: %s", e)
@@ -177,8 +296,8 @@ async def evaluate(request: EvaluateRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/languages")
-async def get_supported_languages():
+@app.get("/languages", response_model=LanguagesResponse)
+async def get_supported_languages(translation_service: TranslationService = Depends(get_translation_service)):
     """Get list of supported languages"""
     stats = translation_service.translation_memory.get_stats()
     return {
@@ -187,8 +306,8 @@ async def get_supported_languages():
     }
 
 
-@app.get("/content-types")
-async def get_content_types():
+@app.get("/content-types", response_model=ContentTypesResponse)
+async def get_content_types(translation_service: TranslationService = Depends(get_translation_service)):
     """Get list of supported content types"""
     stats = translation_service.translation_memory.get_stats()
     return {
@@ -198,10 +317,10 @@ async def get_content_types():
 
 
 # Run with: uvicorn api.main:app --reload
+# Production: gunicorn api.main:app -k uvicorn.workers.UvicornWorker -w $((2 * $(nproc)))
 if __name__ == "__main__":
     import uvicorn
-    logging.basicConfig(level=logging.INFO)
-    logger.info("Starting Localization API Server...")
-    logger.info("API Documentation: http://localhost:8000/docs")
-    logger.info("Health Check: http://localhost:8000/health")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    host, port = "0.0.0.0", 8000
+    logger.info("Starting Localization API on http://%s:%d (docs at /docs)", host, port)
+    # loop/http "auto" select uvloop and httptools when installed (uvicorn[standard])
+    uvicorn.run(app, host=host, port=port, loop="auto", http="auto")
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Client-side Rate Limiter
+Keeps outbound LLM traffic under the provider's RPM/TPM quota and concurrency limits
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+class _TokenBucket:
+    """Token bucket that refills continuously up to a per-minute capacity"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.refill_rate = per_minute / 60.0  # tokens per second
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill()
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """Combines a concurrency gate with request-per-minute and token-per-minute buckets"""
+
+    def __init__(self, rpm: int = 10, tpm: int = 250_000, max_concurrency: int = 4):
+        """
+        Initialize rate limiter
+
+        Args:
+            rpm: Maximum requests per minute
+            tpm: Maximum (estimated) tokens per minute
+            max_concurrency: Maximum number of in-flight requests
+        """
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._requests = _TokenBucket(rpm)
+        self._tokens = _TokenBucket(tpm)
+        # Serializes bucket reservation so waiters are admitted in arrival order
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int = 0) -> AsyncIterator[None]:
+        """
+        Wait for a concurrency slot and enough RPM/TPM budget, then hold the slot
+
+        Args:
+            estimated_tokens: Approximate token cost of the request
+        """
+        # A single oversized request must still be admissible once the bucket is full
+        estimated_tokens = min(estimated_tokens, self._tokens.capacity)
+        async with self._semaphore:
+            async with self._lock:
+                while True:
+                    delay = max(
+                        self._requests.wait_time(1),
+                        self._tokens.wait_time(estimated_tokens)
+                    )
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                self._requests.consume(1)
+                self._tokens.consume(estimated_tokens)
+            yield
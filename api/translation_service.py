@@ -2,16 +2,132 @@
 Translation Service
 Integrates LLM API with translation memory for context-aware translations
 """
-import json
+import asyncio
+import hashlib
 import logging
 import re
 import time
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import orjson
 from database.vector_store import TranslationMemory
-from api.llm_service import call_llm
+from database.response_cache import ResponseCache, create_response_cache
+from api.llm_service import call_llm, call_llm_async, call_llm_stream
+from api.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Shorter source texts skip the translation memory similarity search
+_MIN_SIMILARITY_WORDS = 2
+
+# Per-word pricing used for the cost savings estimate
+_HUMAN_COST_PER_WORD = 0.20  # $0.20 per word average
+_AI_COST_PER_WORD = 0.002  # Approximate API cost
+_COST_SAVINGS = f"{int((1 - _AI_COST_PER_WORD / _HUMAN_COST_PER_WORD) * 100)}% cost reduction"
+
+# Markdown code fences around (or inside) LLM JSON output
+_FENCE_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)\s*```")
+_FENCE_STRIP_RE = re.compile(r"```[a-z]*\n?")
+
+# Opening of the "translation" string value in the LLM's JSON output
+_TRANSLATION_FIELD_RE = re.compile(r'"translation"\s*:\s*"')
+
+# Static prompt sections, built once instead of on every request
+_PROMPT_HEADER_TMPL = """You are a professional localization engine.
+
+Translate the following text to {lang} for UI usage.
+
+Source Text:
+"{text}"
+
+TARGET LANGUAGE: {lang}
+"""
+
+_PROMPT_INSTRUCTIONS_TAIL = """
+---
+INSTRUCTIONS:
+1. Translate the source text maintaining brand voice and consistency.
+2. Use past translations and guidelines as reference.
+3. Return ONLY valid JSON with these exact keys (no markdown, no extra text):
+   - "translation": your translation string
+   - "confidence_score": number from 0 to 100
+   - "explanation": brief explanation of your translation choices
+
+Example format:
+{"translation": "...", "confidence_score": 92, "explanation": "..."}
+"""
+
+
+class _TranslationFieldStream:
+    """
+    Incrementally extracts the "translation" string value from streamed JSON
+    
+    Each feed() returns the newly decoded part of the translation so it can be
+    forwarded before the rest of the JSON (confidence, explanation) arrives.
+    """
+    
+    def __init__(self):
+        self.buffer = ""
+        self._start = None  # index of the first character of the string value
+        self._emitted = 0  # raw characters of the value already decoded and returned
+        self._done = False
+    
+    def feed(self, chunk: str) -> str:
+        self.buffer += chunk
+        if self._done:
+            return ""
+        if self._start is None:
+            match = _TRANSLATION_FIELD_RE.search(self.buffer)
+            if not match:
+                return ""
+            self._start = match.end()
+        
+        pieces = []
+        while not self._done:
+            raw = self.buffer[self._start + self._emitted:]
+            end = self._safe_end(raw)
+            if end == 0:
+                break
+            self._emitted += end
+            if end < len(raw) and raw[end] == '"':
+                self._done = True
+            try:
+                pieces.append(orjson.loads(f'"{raw[:end]}"'))
+            except orjson.JSONDecodeError:
+                # Not strictly valid JSON (e.g. a raw newline); pass the text through as-is
+                pieces.append(raw[:end])
+        return "".join(pieces)
+    
+    def _safe_end(self, raw: str) -> int:
+        """Length of the prefix of `raw` that ends on a complete character, stopping at the closing quote."""
+        i = 0
+        while i < len(raw):
+            c = raw[i]
+            if c == '"':
+                return i
+            if c != "\\":
+                i += 1
+                continue
+            if i + 1 >= len(raw):
+                return i
+            if raw[i + 1] != "u":
+                i += 2
+                continue
+            if i + 6 > len(raw):
+                return i
+            try:
+                code_point = int(raw[i + 2:i + 6], 16)
+            except ValueError:
+                # Malformed escape: end the piece here, so only "\\u" itself is passed through undecoded
+                return i if i else 2
+            # A high surrogate is only decodable together with the low surrogate that follows it
+            if 0xD800 <= code_point <= 0xDBFF:
+                if i + 12 > len(raw):
+                    return i
+                i += 12
+            else:
+                i += 6
+        return i
+
 
 class TranslationService:
     """Handles AI-powered translation with context awareness"""
@@ -19,8 +135,25 @@ class TranslationService:
     def __init__(self):
         """Initialize translation service with LLM API and translation memory"""
         self.translation_memory = TranslationMemory()
+        self.response_cache = create_response_cache()
+        # Translation memory context is stable between invalidations, so cache lookups per argument tuple
+        self._similar_cache = TTLCache(maxsize=4096, ttl=3600)
+        self._guidelines_cache = TTLCache(maxsize=4096, ttl=3600)
+        # In-flight LLM calls keyed by prompt hash, shared by concurrent identical requests
+        self._inflight: Dict[bytes, asyncio.Task] = {}
+        # Bumped on every invalidation so HTTP ETags issued before it stop matching
+        self.generation = 0
+        self._refresh_known_languages()
         logger.info("Translation Service initialized")
     
+    def _refresh_known_languages(self) -> None:
+        """Record which languages have any translation memory rows or brand guidelines."""
+        self._known_languages = set(self.translation_memory.get_stats()['languages'])
+        self._languages_with_guidelines = {
+            language for language in self._known_languages
+            if self.translation_memory.get_brand_guidelines(target_language=language)
+        }
+    
     def translate(
         self,
         source_text: str,
@@ -40,22 +173,148 @@ class TranslationService:
         Returns:
             Dict with translation, confidence score, explanation, and metrics
         """
-        start_time = time.time()
+        start = time.perf_counter()
         
+        # Serve repeated requests from the response cache without calling the LLM
+        cache_key = ResponseCache.make_key(target_language, content_type, product_category)
+        cached = self.response_cache.get(source_text, cache_key)
+        if cached is not None:
+            return self._cache_hit_result(cached, start)
+        
+        prompt, context_used = self._prepare_prompt(
+            source_text, target_language, content_type, product_category
+        )
+        
+        # Call LLM
+        raw_response = call_llm(prompt)
+        
+        result = self._build_result(source_text, raw_response, context_used, start)
+        # Only cache usable translations; unparseable responses should be retried
+        if result["translation"]:
+            self.response_cache.put(source_text, cache_key, result)
+        return result
+    
+    async def translate_async(
+        self,
+        source_text: str,
+        target_language: str,
+        content_type: Optional[str] = None,
+        product_category: Optional[str] = None
+    ) -> Dict:
+        """
+        Async variant of translate that awaits the LLM call instead of blocking
+        
+        Context retrieval, parsing and metrics stay synchronous; only the
+        network round trip to the LLM is awaited.
+        """
+        start = time.perf_counter()
+        
+        cache_key = ResponseCache.make_key(target_language, content_type, product_category)
+        cached = await self.response_cache.aget(source_text, cache_key)
+        if cached is not None:
+            return self._cache_hit_result(cached, start)
+        
+        prompt, context_used = self._prepare_prompt(
+            source_text, target_language, content_type, product_category
+        )
+        
+        raw_response = await self._call_llm_single_flight(prompt)
+        
+        result = self._build_result(source_text, raw_response, context_used, start)
+        if result["translation"]:
+            await self.response_cache.aput(source_text, cache_key, result)
+        return result
+    
+    async def translate_stream(
+        self,
+        source_text: str,
+        target_language: str,
+        content_type: Optional[str] = None,
+        product_category: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of translate_async
+        
+        Yields {"event": "delta", "data": {"text": ...}} events as the translation
+        text arrives, followed by a single {"event": "result", "data": ...} event
+        carrying the same dict translate() returns.
+        """
+        start = time.perf_counter()
+        
+        cache_key = ResponseCache.make_key(target_language, content_type, product_category)
+        cached = await self.response_cache.aget(source_text, cache_key)
+        if cached is not None:
+            cached = self._cache_hit_result(cached, start)
+            yield {"event": "delta", "data": {"text": cached["translation"]}}
+            yield {"event": "result", "data": cached}
+            return
+        
+        prompt, context_used = self._prepare_prompt(
+            source_text, target_language, content_type, product_category
+        )
+        
+        field_stream = _TranslationFieldStream()
+        async for chunk in call_llm_stream(prompt):
+            delta = field_stream.feed(chunk)
+            if delta:
+                yield {"event": "delta", "data": {"text": delta}}
+        
+        result = self._build_result(source_text, field_stream.buffer, context_used, start)
+        if result["translation"]:
+            await self.response_cache.aput(source_text, cache_key, result)
+        yield {"event": "result", "data": result}
+    
+    async def aclose(self) -> None:
+        """Release response cache connections; call once on application shutdown."""
+        await self.response_cache.aclose()
+    
+    async def _call_llm_single_flight(self, prompt: str) -> str:
+        """
+        Call the LLM, coalescing concurrent calls for an identical prompt into one request
+        
+        Lookup and registration happen without an intervening await, so no lock is
+        needed on the single event loop. Waiters are shielded so one cancelled
+        request does not cancel the call the others are waiting on.
+        """
+        prompt_hash = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest()
+        task = self._inflight.get(prompt_hash)
+        if task is None:
+            task = asyncio.ensure_future(call_llm_async(prompt))
+            self._inflight[prompt_hash] = task
+            
+            def _release(done: asyncio.Task) -> None:
+                self._inflight.pop(prompt_hash, None)
+                # Mark the exception as retrieved even if every waiter was cancelled
+                if not done.cancelled():
+                    done.exception()
+            
+            task.add_done_callback(_release)
+        return await asyncio.shield(task)
+    
+    def _cache_hit_result(self, cached: Dict, start: float) -> Dict:
+        """Return a cached translation with fresh metrics."""
+        return {
+            **cached,
+            **self._processing_time(start),
+            "cost_savings": "100% cost reduction",
+            "context_used": {**cached["context_used"], "cache_hit": True}
+        }
+    
+    def _prepare_prompt(
+        self,
+        source_text: str,
+        target_language: str,
+        content_type: Optional[str],
+        product_category: Optional[str]
+    ) -> Tuple[str, Dict]:
+        """Retrieve translation memory context and build the LLM prompt."""
         # Find similar translations for context
-        similar_translations = self.translation_memory.find_similar_translations(
-            source_text=source_text,
-            target_language=target_language,
-            content_type=content_type,
-            product_category=product_category,
-            top_k=3
+        similar_translations = self._cached_similar(
+            source_text, target_language, content_type, product_category
         )
         
         # Get brand guidelines
-        brand_guidelines = self.translation_memory.get_brand_guidelines(
-            target_language=target_language,
-            product_category=product_category
-        )
+        brand_guidelines = self._cached_guidelines(target_language, product_category)
         
         # Build context-enriched prompt
         prompt = self._build_prompt(
@@ -67,27 +326,102 @@ class TranslationService:
             product_category=product_category
         )
         
-        # Call LLM
-        raw_response = call_llm(prompt)
+        context_used = {
+            "similar_translations_count": len(similar_translations),
+            "brand_guidelines_count": len(brand_guidelines),
+            "cache_hit": False
+        }
+        return prompt, context_used
+    
+    def _cached_similar(
+        self,
+        source_text: str,
+        target_language: str,
+        content_type: Optional[str],
+        product_category: Optional[str]
+    ) -> List[Dict]:
+        """Find similar translations, reusing results for identical queries."""
+        # Single words carry little similarity signal, and unknown languages never match
+        if (len(source_text.split()) < _MIN_SIMILARITY_WORDS
+                or target_language not in self._known_languages):
+            return []
+        
+        key = (source_text, target_language, content_type, product_category)
+        similar_translations = self._similar_cache.get(key)
+        if similar_translations is None:
+            similar_translations = self.translation_memory.find_similar_translations(
+                source_text=source_text,
+                target_language=target_language,
+                content_type=content_type,
+                product_category=product_category,
+                top_k=3
+            )
+            self._similar_cache.set(key, similar_translations)
+        return similar_translations
+    
+    def _cached_guidelines(
+        self,
+        target_language: str,
+        product_category: Optional[str]
+    ) -> List[str]:
+        """Get brand guidelines, reusing results per (language, product category)."""
+        if target_language not in self._languages_with_guidelines:
+            return []
         
+        key = (target_language, product_category)
+        brand_guidelines = self._guidelines_cache.get(key)
+        if brand_guidelines is None:
+            brand_guidelines = self.translation_memory.get_brand_guidelines(
+                target_language=target_language,
+                product_category=product_category
+            )
+            self._guidelines_cache.set(key, brand_guidelines)
+        return brand_guidelines
+    
+    async def invalidate_caches(self) -> int:
+        """
+        Reload the translation memory and clear context and response caches
+        
+        Call after the translation memory CSV changes. The memory is rebuilt
+        from the CSV (or its snapshot, if still newer) off the event loop.
+        
+        Returns:
+            Number of entries dropped across all caches
+        """
+        self.translation_memory = await asyncio.to_thread(TranslationMemory)
+        self.generation += 1
+        cleared = len(self._similar_cache) + len(self._guidelines_cache)
+        self._similar_cache.clear()
+        self._guidelines_cache.clear()
+        cleared += await self.response_cache.aclear()
+        self._refresh_known_languages()
+        logger.info("Translation caches invalidated (%d entries)", cleared)
+        return cleared
+    
+    def _build_result(
+        self,
+        source_text: str,
+        raw_response: str,
+        context_used: Dict,
+        start: float
+    ) -> Dict:
+        """Parse the LLM response and attach metrics; callers cache it if the translation is non-empty."""
         # Parse JSON response
         translation_result = self._parse_response(raw_response)
         
         # Calculate metrics
-        processing_time = round(time.time() - start_time, 2)
         cost_savings = self._estimate_cost_savings(source_text)
         
-        return {
+        result = {
             "translation": translation_result["translation"],
             "confidence_score": translation_result["confidence_score"],
             "explanation": translation_result["explanation"],
-            "processing_time": f"{processing_time}s",
+            **self._processing_time(start),
             "cost_savings": cost_savings,
-            "context_used": {
-                "similar_translations_count": len(similar_translations),
-                "brand_guidelines_count": len(brand_guidelines)
-            }
+            "context_used": context_used
         }
+        
+        return result
     
     def _build_prompt(
         self,
@@ -99,51 +433,29 @@ class TranslationService:
         product_category: Optional[str]
     ) -> str:
         """Build context-enriched prompt for LLM with structured JSON output."""
-        
-        prompt = f"""You are a professional localization engine.
-
-Translate the following text to {target_language} for UI usage.
-
-Source Text:
-"{source_text}"
-
-TARGET LANGUAGE: {target_language}
-"""
+        parts = [_PROMPT_HEADER_TMPL.format(lang=target_language, text=source_text)]
         
         if content_type:
-            prompt += f"CONTENT TYPE: {content_type}\n"
+            parts.append(f"CONTENT TYPE: {content_type}\n")
         
         if product_category:
-            prompt += f"PRODUCT CATEGORY: {product_category}\n"
+            parts.append(f"PRODUCT CATEGORY: {product_category}\n")
         
         if similar_translations:
-            prompt += "\n---\nRELEVANT PAST TRANSLATIONS (for context and consistency):\n"
+            parts.append("\n---\nRELEVANT PAST TRANSLATIONS (for context and consistency):\n")
             for i, trans in enumerate(similar_translations, 1):
-                prompt += f"\n{i}. Source: \"{trans['source_text']}\"\n"
-                prompt += f"   Translation: \"{trans['translation']}\"\n"
+                parts.append(f"\n{i}. Source: \"{trans['source_text']}\"\n")
+                parts.append(f"   Translation: \"{trans['translation']}\"\n")
                 if trans.get('brand_notes'):
-                    prompt += f"   Brand Note: {trans['brand_notes']}\n"
+                    parts.append(f"   Brand Note: {trans['brand_notes']}\n")
         
         if brand_guidelines:
-            prompt += "\n---\nBRAND GUIDELINES FOR THIS LANGUAGE:\n"
+            parts.append("\n---\nBRAND GUIDELINES FOR THIS LANGUAGE:\n")
             for i, guideline in enumerate(brand_guidelines[:5], 1):
-                prompt += f"{i}. {guideline}\n"
-        
-        prompt += """
----
-INSTRUCTIONS:
-1. Translate the source text maintaining brand voice and consistency.
-2. Use past translations and guidelines as reference.
-3. Return ONLY valid JSON with these exact keys (no markdown, no extra text):
-   - "translation": your translation string
-   - "confidence_score": number from 0 to 100
-   - "explanation": brief explanation of your translation choices
-
-Example format:
-{"translation": "...", "confidence_score": 92, "explanation": "..."}
-"""
+                parts.append(f"{i}. {guideline}\n")
         
-        return prompt
+        parts.append(_PROMPT_INSTRUCTIONS_TAIL)
+        return "".join(parts)
     
     def _parse_response(self, response_text: str) -> Dict:
         """Parse LLM's JSON response into structured format."""
@@ -151,43 +463,53 @@ Example format:
             response_text = ""
         text = response_text.strip()
         # Strip markdown code block if present
-        json_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", text)
+        json_match = _FENCE_RE.search(text)
         if json_match:
             text = json_match.group(1).strip()
         try:
-            data = json.loads(text)
+            data = orjson.loads(text)
             # Ensure translation is pure text (strip any markdown or extra formatting)
             translation = str(data.get("translation", "")).strip()
             # Remove markdown code blocks if accidentally included
-            translation = re.sub(r"```[a-z]*\n?", "", translation).strip()
+            translation = _FENCE_STRIP_RE.sub("", translation).strip()
             
             return {
                 "translation": translation,
                 "confidence_score": min(max(int(data.get("confidence_score", 85)), 0), 100),
                 "explanation": str(data.get("explanation", "")).strip()
             }
-        except (json.JSONDecodeError, ValueError, TypeError):
+        except (orjson.JSONDecodeError, ValueError, TypeError):
             return {
                 "translation": "",
                 "confidence_score": 85,
                 "explanation": "Response could not be parsed as JSON."
             }
     
+    @staticmethod
+    def _processing_time(start: float) -> Dict:
+        """
+        Elapsed time since `start` (a time.perf_counter() reading)
+        
+        processing_time_ms is the machine-readable value; the formatted
+        processing_time string is kept for existing clients.
+        """
+        processing_time_ms = int((time.perf_counter() - start) * 1000)
+        return {
+            "processing_time": f"{processing_time_ms / 1000:.2f}s",
+            "processing_time_ms": processing_time_ms
+        }
+    
     def _estimate_cost_savings(self, source_text: str) -> str:
         """
         Estimate cost savings vs traditional human translation
         
         Traditional translation: ~$0.15-0.25 per word
         AI translation: ~$0.002 per word (API costs)
-        """
-        word_count = len(source_text.split())
         
-        traditional_cost = word_count * 0.20  # $0.20 per word average
-        ai_cost = word_count * 0.002  # Approximate API cost
-        
-        if traditional_cost > 0:
-            savings_percent = int((1 - ai_cost / traditional_cost) * 100)
-            return f"{savings_percent}% cost reduction"
+        Both costs scale with word count, so the ratio is fixed; only empty text differs.
+        """
+        if source_text.strip():
+            return _COST_SAVINGS
         
         return "90%+ cost reduction"
 
@@ -195,8 +517,6 @@ Example format:
 # Test the service if run directly
 if __name__ == "__main__":
     import sys
-    from dotenv import load_dotenv
-    load_dotenv()
     
     logger.info("Testing Translation Service...")
     
@@ -0,0 +1,240 @@
+"""
+Response Cache
+Stores finished translations so repeated requests skip the LLM call
+"""
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+
+class ResponseCache:
+    """
+    LRU cache of translation results keyed on source text + request context
+
+    Only texts that differ in whitespace share an entry. A word-overlap
+    similarity tier ignores word order and punctuation ("from Desktop to
+    Documents" vs "from Documents to Desktop"), so near-matches need an
+    embedding model before they can safely reuse a translation.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        """
+        Initialize an empty cache
+
+        Args:
+            max_entries: Maximum number of cached translations before LRU eviction
+        """
+        self.max_entries = max_entries
+        # text + context hash -> result, ordered oldest -> most recently used
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+    @staticmethod
+    def make_key(
+        target_language: str,
+        content_type: Optional[str] = None,
+        product_category: Optional[str] = None
+    ) -> CacheKey:
+        """Build the composite context key a cached translation must match exactly"""
+        return (target_language, content_type or "", product_category or "")
+
+    def get(self, source_text: str, key: CacheKey) -> Optional[Dict]:
+        """
+        Look up a cached translation result
+
+        Returns:
+            The stored translation result, or None on a miss
+        """
+        entry_hash = self._hash(self._normalize(source_text), key)
+        result = self._entries.get(entry_hash)
+        if result is not None:
+            self._entries.move_to_end(entry_hash)
+        return result
+
+    def put(self, source_text: str, key: CacheKey, result: Dict) -> None:
+        """Store a translation result, evicting the least recently used entry when full"""
+        entry_hash = self._hash(self._normalize(source_text), key)
+        self._entries[entry_hash] = result
+        self._entries.move_to_end(entry_hash)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached entry"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def aget(self, source_text: str, key: CacheKey) -> Optional[Dict]:
+        """get() for callers on the event loop; backends doing network I/O await it"""
+        return self.get(source_text, key)
+
+    async def aput(self, source_text: str, key: CacheKey, result: Dict) -> None:
+        """put() for callers on the event loop"""
+        self.put(source_text, key, result)
+
+    async def aclear(self) -> int:
+        """Drop every cached entry, returning how many were dropped"""
+        cleared = len(self)
+        self.clear()
+        return cleared
+
+    async def aclose(self) -> None:
+        """Release backend connections; call once on application shutdown"""
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Collapse whitespace so trivially different strings share an entry; case is kept"""
+        return " ".join(text.split())
+
+    @staticmethod
+    def _hash(normalized: str, key: CacheKey) -> str:
+        # JSON-encode the fields so no separator inside a field can make two keys collide
+        payload = orjson.dumps((normalized,) + key)
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class RedisResponseCache(ResponseCache):
+    """
+    ResponseCache stored in Redis so every worker and replica shares one hit rate
+
+    Each entry is a hash at {key_prefix}{hash of text + context key}, so clear()
+    and len() only touch this cache's keys. Request handlers go through the async
+    client (aget/aput/aclear); the sync client serves the blocking translate() path.
+    Redis (maxmemory-policy allkeys-lru) plus a per-entry TTL take the place of
+    the in-process LRU bound. Redis failures are logged and treated as cache misses.
+    """
+
+    def __init__(
+        self,
+        client,
+        async_client,
+        key_prefix: str = "localization-api:rc:",
+        ttl_seconds: int = 7 * 86400
+    ):
+        """
+        Initialize cache on existing Redis clients
+
+        Args:
+            client: redis.Redis instance
+            async_client: redis.asyncio.Redis instance for the same server
+            key_prefix: Namespace for this cache's keys
+            ttl_seconds: Seconds an entry lives after it was last stored or hit
+        """
+        super().__init__()
+        self._redis = client
+        self._async_redis = async_client
+        self.key_prefix = key_prefix
+        self.ttl_seconds = ttl_seconds
+
+    def _entry_key(self, source_text: str, key: CacheKey) -> str:
+        return self.key_prefix + self._hash(self._normalize(source_text), key)
+
+    def get(self, source_text: str, key: CacheKey) -> Optional[Dict]:
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            self._queue_get(pipe, self._entry_key(source_text, key))
+            raw, _ = pipe.execute()
+        except Exception as e:
+            logger.warning("Response cache lookup failed, treating as miss: %s", e)
+            return None
+        return None if raw is None else orjson.loads(raw)
+
+    async def aget(self, source_text: str, key: CacheKey) -> Optional[Dict]:
+        try:
+            pipe = self._async_redis.pipeline(transaction=False)
+            self._queue_get(pipe, self._entry_key(source_text, key))
+            raw, _ = await pipe.execute()
+        except Exception as e:
+            logger.warning("Response cache lookup failed, treating as miss: %s", e)
+            return None
+        return None if raw is None else orjson.loads(raw)
+
+    def put(self, source_text: str, key: CacheKey, result: Dict) -> None:
+        try:
+            pipe = self._redis.pipeline()
+            self._queue_put(pipe, self._entry_key(source_text, key), result)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Response cache store failed: %s", e)
+
+    async def aput(self, source_text: str, key: CacheKey, result: Dict) -> None:
+        try:
+            pipe = self._async_redis.pipeline()
+            self._queue_put(pipe, self._entry_key(source_text, key), result)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning("Response cache store failed: %s", e)
+
+    def _queue_get(self, pipe, entry_key: str) -> None:
+        """Queue the lookup plus a TTL refresh, so a hit costs one round trip"""
+        pipe.hget(entry_key, "result")
+        pipe.expire(entry_key, self.ttl_seconds)
+
+    def _queue_put(self, pipe, entry_key: str, result: Dict) -> None:
+        pipe.hset(entry_key, mapping={
+            "result": orjson.dumps(result),
+            "timestamp": time.time()
+        })
+        pipe.expire(entry_key, self.ttl_seconds)
+
+    def clear(self) -> None:
+        try:
+            for cache_key in self._redis.scan_iter(match=self.key_prefix + "*", count=1000):
+                self._redis.delete(cache_key)
+        except Exception as e:
+            logger.warning("Response cache clear failed: %s", e)
+
+    async def aclear(self) -> int:
+        cleared = 0
+        try:
+            async for cache_key in self._async_redis.scan_iter(match=self.key_prefix + "*", count=1000):
+                cleared += await self._async_redis.delete(cache_key)
+        except Exception as e:
+            logger.warning("Response cache clear failed: %s", e)
+        return cleared
+
+    def __len__(self) -> int:
+        try:
+            return sum(1 for _ in self._redis.scan_iter(match=self.key_prefix + "*", count=1000))
+        except Exception as e:
+            logger.warning("Response cache size lookup failed: %s", e)
+            return 0
+
+    async def aclose(self) -> None:
+        await self._async_redis.aclose()
+        self._redis.close()
+
+
+def create_response_cache() -> ResponseCache:
+    """
+    Build the response cache for this process
+
+    Uses Redis when REDIS_URL is set and reachable so all workers share entries,
+    otherwise an in-process ResponseCache.
+    """
+    redis_url = os.environ.get("REDIS_URL", "").strip()
+    if not redis_url:
+        return ResponseCache()
+
+    try:
+        import redis
+        import redis.asyncio
+        client = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        client.ping()
+        async_client = redis.asyncio.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+    except Exception as e:
+        logger.warning("Redis unavailable at REDIS_URL (%s), using in-process response cache", e)
+        return ResponseCache()
+
+    logger.info("Using Redis response cache")
+    return RedisResponseCache(client, async_client)
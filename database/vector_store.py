@@ -2,18 +2,177 @@
 Context Retrieval System
 Finds relevant past translations and brand guidelines from translation memory
 """
+import logging
+import os
+import pickle
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import re
 
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r'\w+')
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+# Translation memory metadata columns with few distinct values
+_CATEGORY_COLUMNS = ('target_language', 'content_type', 'product_category')
+
+# Translation memory columns returned for each similar translation
+_RESULT_COLUMNS = ('source_text', 'translation', 'content_type', 'product_category', 'brand_notes')
+
+# Bump whenever the prepared attributes change, so stale snapshots are rebuilt
+_SNAPSHOT_VERSION = 4
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    """(size, mtime in ns) of a file, to tell whether a snapshot was built from exactly this version of it"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _encode_column(values: pd.Series):
+    """
+    Integer-encode a low-cardinality column
+    
+    Returns:
+        (codes array in the smallest fitting int dtype, value -> code mapping)
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    dtype = np.int8 if len(uniques) <= np.iinfo(np.int8).max else np.int32
+    return codes.astype(dtype), {value: code for code, value in enumerate(uniques)}
+
+
+def _positions_in(rows: np.ndarray, members: np.ndarray):
+    """
+    Locate members within a sorted array of row positions
+    
+    Returns:
+        (indexes into rows of the members present, mask of members that were present)
+    """
+    positions = np.searchsorted(rows, members)
+    found = positions < rows.size
+    found[found] = rows[positions[found]] == members[found]
+    return positions[found], found
+
 
 class TranslationMemory:
     """Manages translation memory and context retrieval"""
     
-    def __init__(self, csv_path: str = "data/translation_memory.csv"):
-        """Initialize translation memory from CSV"""
-        self.df = pd.read_csv(csv_path)
-        print(f"[OK] Loaded {len(self.df)} translations from memory")
+    def __init__(self, csv_path: str = "data/translation_memory.csv", snapshot_path: Optional[str] = None):
+        """
+        Initialize translation memory from CSV
+        
+        The prepared memory is pickled next to the CSV and reloaded from there
+        on later starts, skipping parsing and indexing while the CSV keeps the
+        exact size and modification time it was built from.
+        
+        Args:
+            csv_path: Translation memory CSV
+            snapshot_path: Snapshot location (default: the CSV path with a .pkl extension)
+        """
+        snapshot_path = snapshot_path or os.path.splitext(csv_path)[0] + '.pkl'
+        if not self._load_snapshot(csv_path, snapshot_path):
+            self._build(csv_path)
+            try:
+                self.save(snapshot_path)
+            except OSError as e:
+                logger.warning("Could not write translation memory snapshot %s: %s", snapshot_path, e)
+        logger.info("Loaded %d translations from memory", len(self.df))
+    
+    def _build(self, csv_path: str) -> None:
+        """Parse the CSV and precompute the tokens, indexes and stats used by queries"""
+        # Taken before reading, so a CSV replaced mid-read never matches the snapshot
+        self._source_signature = _file_signature(csv_path)
+        # Low-cardinality metadata columns load as categoricals (int codes + one copy of each label)
+        self.df = pd.read_csv(csv_path, dtype={column: 'category' for column in _CATEGORY_COLUMNS})
+        # Lowercase and tokenize every row once so queries only tokenize the query text
+        self._lower = [str(text).lower() for text in self.df['source_text']]
+        # Variable-width strings: a fixed-width <U array would pad every row to the longest one
+        self._lower_array = np.array(self._lower, dtype=np.dtypes.StringDType())
+        self._text_lengths = np.strings.str_len(self._lower_array)
+        self._tokens = [frozenset(_WORD_RE.findall(text)) for text in self._lower]
+        # Inverted index: word -> positions of the rows containing it
+        postings: Dict[str, List[int]] = {}
+        for row, tokens in enumerate(self._tokens):
+            for token in tokens:
+                postings.setdefault(token, []).append(row)
+        self._postings = {token: np.array(rows, dtype=np.int64) for token, rows in postings.items()}
+        self._token_lengths = np.fromiter((len(tokens) for tokens in self._tokens), dtype=np.int64, count=len(self._tokens))
+        # Rows with words per exact text, and the distinct lengths of those texts, for the row-in-query lookup
+        rows_by_text: Dict[str, List[int]] = {}
+        for row, text in enumerate(self._lower):
+            if self._tokens[row]:
+                rows_by_text.setdefault(text, []).append(row)
+        self._rows_by_text = {text: np.array(rows, dtype=np.int64) for text, rows in rows_by_text.items()}
+        self._distinct_text_lengths = np.unique(self._text_lengths[self._token_lengths > 0])
+        # Column store for the query hot path: plain arrays instead of pandas indexing
+        self._columns = {column: self.df[column].to_numpy() for column in _RESULT_COLUMNS}
+        self._lang_codes, self._lang_lookup = _encode_column(self.df['target_language'])
+        self._ctype_codes, self._ctype_lookup = _encode_column(self.df['content_type'])
+        self._pcat_codes, self._pcat_lookup = _encode_column(self.df['product_category'])
+        # Row positions per language and per (language, product category)
+        self._by_lang = {
+            language: np.flatnonzero(self._lang_codes == code)
+            for language, code in self._lang_lookup.items()
+        }
+        self._by_lang_cat = {}
+        for language, rows in self._by_lang.items():
+            for category, code in self._pcat_lookup.items():
+                category_rows = rows[self._pcat_codes[rows] == code]
+                if category_rows.size:
+                    self._by_lang_cat[(language, category)] = category_rows
+        # Brand guidelines per (language, product category), with (language, None) for all categories
+        self._guidelines: Dict[Tuple[str, Optional[str]], List[str]] = {
+            (language, None): self._unique_notes(rows) for language, rows in self._by_lang.items()
+        }
+        self._guidelines.update(
+            (key, self._unique_notes(rows)) for key, rows in self._by_lang_cat.items()
+        )
+        # Memory is read-only after load, so stats can be computed once up front
+        self._stats = self._compute_stats()
+    
+    def save(self, path: str) -> None:
+        """Pickle the prepared memory to a snapshot file"""
+        # Write to a temporary file and rename, so workers starting concurrently never read a partial snapshot
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        state = {name: value for name, value in self.__dict__.items() if name != '_source_signature'}
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((_SNAPSHOT_VERSION, self._source_signature, state), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "TranslationMemory":
+        """Restore a memory pickled by save(), without checking it against its CSV"""
+        with open(path, 'rb') as f:
+            version, *payload = pickle.load(f)
+        if version != _SNAPSHOT_VERSION:
+            raise ValueError(f"Translation memory snapshot {path} has version {version}, expected {_SNAPSHOT_VERSION}")
+        source_signature, state = payload
+        memory = cls.__new__(cls)
+        memory.__dict__.update(state)
+        memory._source_signature = source_signature
+        return memory
+    
+    def _load_snapshot(self, csv_path: str, snapshot_path: str) -> bool:
+        """
+        Restore prepared state from a snapshot of exactly this CSV; False if it has to be rebuilt
+        
+        Size and mtime must both match: comparing against the snapshot's own mtime would
+        miss a CSV replaced by a copy with an older timestamp (cp -p, rsync -a, tar x).
+        """
+        try:
+            memory = self.load(snapshot_path)
+            if memory._source_signature != _file_signature(csv_path):
+                return False
+            self.__dict__.update(memory.__dict__)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning("Ignoring translation memory snapshot %s: %s", snapshot_path, e)
+            return False
+        return True
     
     def find_similar_translations(
         self, 
@@ -37,69 +196,107 @@ class TranslationMemory:
             List of similar translation entries with relevance scores
         """
         # Filter by target language first
-        filtered_df = self.df[self.df['target_language'] == target_language].copy()
+        idx = self._by_lang.get(target_language)
         
-        if len(filtered_df) == 0:
+        if idx is None:
             return []
         
-        # Calculate text similarity scores
-        filtered_df['similarity_score'] = filtered_df['source_text'].apply(
-            lambda x: self._calculate_similarity(source_text.lower(), x.lower())
-        )
+        # Calculate text similarity scores against the pre-tokenized rows
+        query_lower = source_text.lower()
+        query_tokens = frozenset(_WORD_RE.findall(query_lower))
+        sims = self._calculate_similarity(query_tokens, query_lower, idx)
         
-        # Boost scores for matching metadata
+        # Boost scores for matching metadata, in place in the single score buffer
         if content_type:
-            filtered_df['similarity_score'] += filtered_df['content_type'].apply(
-                lambda x: 0.2 if x == content_type else 0
-            )
+            np.add(sims, 0.2, out=sims, where=self._ctype_codes[idx] == self._ctype_lookup.get(content_type, -1))
         
         if product_category:
-            filtered_df['similarity_score'] += filtered_df['product_category'].apply(
-                lambda x: 0.3 if x == product_category else 0
-            )
+            np.add(sims, 0.3, out=sims, where=self._pcat_codes[idx] == self._pcat_lookup.get(product_category, -1))
         
-        # Sort by similarity and get top k
-        similar = filtered_df.nlargest(top_k, 'similarity_score')
+        # Select the top k in O(N): partition around the k-th largest score, then sort
+        # only the candidates. A stable sort keeps earlier rows first among equal scores.
+        if top_k <= 0:
+            return []
+        if sims.size > top_k:
+            kth_largest = np.partition(sims, sims.size - top_k)[sims.size - top_k]
+            candidates = np.flatnonzero(sims >= kth_largest)
+            top = candidates[np.argsort(-sims[candidates], kind='stable')][:top_k]
+        else:
+            top = np.argsort(-sims, kind='stable')
+        rows = idx[top]
         
-        # Convert to list of dicts
+        # Convert to list of dicts straight from the column arrays
         results = []
-        for _, row in similar.iterrows():
-            results.append({
-                'source_text': row['source_text'],
-                'translation': row['translation'],
-                'content_type': row['content_type'],
-                'product_category': row['product_category'],
-                'brand_notes': row['brand_notes'],
-                'similarity_score': round(row['similarity_score'], 2)
-            })
+        for row, score in zip(rows, sims[top]):
+            result = {column: values[row] for column, values in self._columns.items()}
+            result['similarity_score'] = round(float(score), 2)
+            results.append(result)
         
         return results
     
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
+    def _calculate_similarity(
+        self,
+        query_tokens: frozenset,
+        query_lower: str,
+        rows: np.ndarray
+    ) -> np.ndarray:
         """
-        Simple word overlap-based similarity score
+        Simple word overlap-based similarity scores for the given (sorted) rows
+        
+        Jaccard similarity of word sets, computed from the inverted word index
+        for the rows sharing a word with the query, plus a boost for substring matches.
         
         In production, this would use embeddings/vector similarity,
         but for prototype, word overlap works well enough
         """
-        # Tokenize
-        words1 = set(re.findall(r'\w+', text1.lower()))
-        words2 = set(re.findall(r'\w+', text2.lower()))
-        
-        if not words1 or not words2:
-            return 0.0
+        similarity = np.zeros(rows.size)
+        if not query_tokens:
+            return similarity
         
-        # Calculate Jaccard similarity
-        intersection = len(words1 & words2)
-        union = len(words1 | words2)
+        # Count shared words from the postings of the query's words only, and score just
+        # the rows that share at least one word; every other row keeps a Jaccard of 0
+        hits = [self._postings[token] for token in query_tokens if token in self._postings]
+        if hits:
+            matched, intersection = np.unique(np.concatenate(hits), return_counts=True)
+            positions, found = _positions_in(rows, matched)
+            intersection = intersection[found]
+            # Calculate Jaccard similarity (|A u B| = |A| + |B| - |A n B|)
+            union = len(query_tokens) + self._token_lengths[rows[positions]] - intersection
+            similarity[positions] = intersection / union
         
-        base_similarity = intersection / union if union > 0 else 0
+        # Boost for exact substring matches, in both directions, as vectorized string searches.
+        # A row can only contain the query if it is at least as long, and only fit inside it if it is no longer.
+        comparable = self._token_lengths[rows] > 0
+        text_lengths = self._text_lengths[rows]
+        substring = np.zeros(rows.size, dtype=bool)
+        # A word strictly inside the query is also a whole word of any row containing the query,
+        # so only rows listing the rarest such word need the query-in-row search
+        interior = [
+            self._postings.get(match.group(), _NO_ROWS) for match in _WORD_RE.finditer(query_lower)
+            if match.start() > 0 and match.end() < len(query_lower)
+        ]
+        if interior:
+            longer, _ = _positions_in(rows, min(interior, key=len))
+            longer = longer[text_lengths[longer] >= len(query_lower)]
+        else:
+            longer = np.flatnonzero(comparable & (text_lengths >= len(query_lower)))
+        # NumPy < 2.2 has no string ufunc loop mixing a Python str with StringDType
+        query_array = np.array(query_lower, dtype=np.dtypes.StringDType())
+        substring[longer] = np.strings.find(self._lower_array[rows[longer]], query_array) >= 0
+        shorter = np.flatnonzero(comparable & (text_lengths <= len(query_lower)))
+        # A row fits inside the query only if its text equals one of the query's substrings, so
+        # look those up by text when there are fewer of them than rows to search
+        lengths = self._distinct_text_lengths[self._distinct_text_lengths <= len(query_lower)]
+        if (len(query_lower) + 1) * lengths.size - lengths.sum() < shorter.size:
+            windows = {query_lower[i:i + length] for length in lengths.tolist() for i in range(len(query_lower) - length + 1)}
+            inside = [self._rows_by_text[window] for window in windows if window in self._rows_by_text]
+            if inside:
+                substring[_positions_in(rows, np.unique(np.concatenate(inside)))[0]] = True
+        else:
+            substring[shorter] |= np.strings.find(query_array, self._lower_array[rows[shorter]]) >= 0
+        np.add(similarity, 0.3, out=similarity, where=substring)
         
-        # Boost for exact substring matches
-        if text1 in text2 or text2 in text1:
-            base_similarity += 0.3
-        
-        return min(base_similarity, 1.0)  # Cap at 1.0
+        return np.minimum(similarity, 1.0, out=similarity)  # Cap at 1.0
     
     def get_brand_guidelines(
         self, 
@@ -112,20 +309,27 @@ class TranslationMemory:
         Returns:
             List of brand guideline strings
         """
-        filtered_df = self.df[self.df['target_language'] == target_language]
-        
+        guidelines = None
         if product_category:
-            product_df = filtered_df[filtered_df['product_category'] == product_category]
-            if len(product_df) > 0:
-                filtered_df = product_df
+            guidelines = self._guidelines.get((target_language, product_category))
+        if guidelines is None:
+            guidelines = self._guidelines.get((target_language, None), [])
         
-        # Get unique, non-null brand notes
-        guidelines = filtered_df['brand_notes'].dropna().unique().tolist()
+        return list(guidelines)
+    
+    def _unique_notes(self, rows: np.ndarray) -> List[str]:
+        """Unique, non-null brand notes of the given rows, in row order, capped at 10"""
+        notes = self._columns['brand_notes'][rows]
+        guidelines = pd.unique(notes[pd.notna(notes)]).tolist()
         
         return guidelines[:10]  # Limit to top 10 most relevant
     
     def get_stats(self) -> Dict:
         """Get translation memory statistics"""
+        return self._stats
+    
+    def _compute_stats(self) -> Dict:
+        """Summarize the loaded translation memory"""
         return {
             'total_translations': len(self.df),
             'languages': self.df['target_language'].unique().tolist(),
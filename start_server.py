@@ -1,3 +1,4 @@
+import logging
 import sys
 import os
 
@@ -6,10 +7,29 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 if __name__ == "__main__":
     import uvicorn
-    from api.main import app
-    
-    print("🚀 Starting Localization API Server...")
-    print("📚 API Documentation: http://localhost:8000/docs")
-    print("🔍 Health Check: http://localhost:8000/health")
-    print("\nPress CTRL+C to stop the server\n")
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+    host, port = "127.0.0.1", 8000
+    logging.getLogger(__name__).info(
+        "Starting Localization API on http://%s:%d (docs at /docs, CTRL+C to stop)", host, port
+    )
+
+    if os.environ.get("API_RELOAD", "").strip().lower() in ("1", "true", "yes"):
+        # Development: single process that restarts on code changes
+        uvicorn.run("api.main:app", host=host, port=port, reload=True)
+    else:
+        # The import string lets every worker process import the app itself. Rate limits,
+        # the key pool, single-flight and the in-process response cache are per worker,
+        # so run several only with limits divided accordingly and REDIS_URL set.
+        # loop/http "auto" select uvloop and httptools when installed (uvicorn[standard]),
+        # and fall back to asyncio/h11 where they are unavailable (e.g. Windows).
+        uvicorn.run(
+            "api.main:app",
+            host=host,
+            port=port,
+            workers=int(os.environ.get("WEB_CONCURRENCY", "1")),
+            loop="auto",
+            http="auto",
+            limit_concurrency=int(os.environ.get("API_LIMIT_CONCURRENCY", "1000")),
+            log_level="warning"
+        )